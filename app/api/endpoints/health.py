@@ -1,22 +1,47 @@
 """
 Health check endpoints
 """
-from fastapi import APIRouter, Depends
+from functools import wraps
+from time import monotonic
+from fastapi import APIRouter, Response
 from app.services.health_service import HealthService
 from app.models.health import HealthResponse
 
+# Probes hit these endpoints every few seconds, a response may be this stale
+HEALTH_CACHE_TTL_SECONDS = 5
+
 router = APIRouter()
 
+# Stateless, shared by every request instead of being built per request
+health_service = HealthService()
+
+def cached_response(ttl_seconds: float):
+    """Cache the endpoint response in-process for ttl_seconds"""
+    def decorator(endpoint):
+        cache = {}
+
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            now = monotonic()
+            if "response" not in cache or now - cache["created_at"] >= ttl_seconds:
+                cache["response"] = await endpoint(*args, **kwargs)
+                cache["created_at"] = now
+            return cache["response"]
+        return wrapper
+    return decorator
+
 @router.get("/", response_model=HealthResponse)
-async def health_check(
-    health_service: HealthService = Depends()
-):
+@cached_response(HEALTH_CACHE_TTL_SECONDS)
+async def health_check():
     """Health check endpoint"""
-    return health_service.get_health_status()
+    # Pre-serialized body, skips response model validation and encoding
+    return Response(
+        content=health_service.get_health_status_json(),
+        media_type="application/json"
+    )
 
 @router.get("/detailed", response_model=HealthResponse)
-async def detailed_health_check(
-    health_service: HealthService = Depends()
-):
+@cached_response(HEALTH_CACHE_TTL_SECONDS)
+async def detailed_health_check():
     """Detailed health check endpoint"""
-    return health_service.get_detailed_health_status() 
\ No newline at end of file
+    return health_service.get_detailed_health_status()
@@ -46,7 +46,9 @@ async def update_user(
     user_service: UserService = Depends()
 ):
     """Update user by ID"""
-    user = user_service.update_user(user_id, user_data)
+    # Only forward the fields the client actually sent
+    payload = user_data.model_dump(exclude_unset=True)
+    user = user_service.update_user(user_id, payload)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,6 +1,7 @@
 """
 Application configuration settings
 """
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -15,6 +16,12 @@ class Settings(BaseSettings):
     # Database settings
     APP_DATABASE_URL: Optional[str] = None
     
+    # Worker threads for sync dependencies/endpoints (anyio default is 40)
+    THREADPOOL_SIZE: int = 200
+    
+    # Accounts files at least this large are loaded with the Polars streaming engine
+    ACCOUNTS_STREAMING_MIN_BYTES: int = 256 * 1024 * 1024
+    
     # Security settings
     # SECRET_KEY: str = "your-secret-key-here"
     # ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
@@ -24,4 +31,9 @@ class Settings(BaseSettings):
         case_sensitive = True
         extra = "ignore"  # Ignore extra environment variables
 
-settings = Settings() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the application settings, parsed from the environment only once"""
+    return Settings()
+
+settings = get_settings()
\ No newline at end of file
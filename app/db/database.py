@@ -2,18 +2,35 @@
 Database connection and session management with SQLAlchemy (Async)
 App database for microservice operations
 """
-from typing import Optional, AsyncGenerator
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, AsyncGenerator, Iterator
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, event, make_url, Engine
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
 from app.models import Base
+from app.models.metrics import Metrics
+from app.models.trades_summary import TradesSummaryRecord
 from os import (
     makedirs,
     path,
     open,
 )
 
+# Per-connection SQLite tuning: WAL lets readers run alongside the writer and
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# Connections kept by the sync engine (background workers), same again as overflow
+SYNC_POOL_SIZE = 16
 
 
 def setup_app_database_url(env_var_value: Optional[str], default_filename: str) -> str:
@@ -35,9 +52,52 @@ def setup_app_database_url(env_var_value: Optional[str], default_filename: str)
     
     return env_var_value
 
+def is_sqlite_memory_url(database_url: str) -> bool:
+    """Check whether the URL points to an in-memory SQLite database (no file behind it)"""
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+def enable_sqlite_pragmas(engine: Engine) -> None:
+    """Apply SQLITE_PRAGMAS to every new DBAPI connection of the engine"""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
 def create_async_database_engine(database_url: str) -> AsyncEngine:
     """Create async SQLAlchemy engine"""
-    return create_async_engine(database_url, echo=False)
+    if is_sqlite_memory_url(database_url):
+        # An in-memory database only lives as long as its connection, share one
+        engine = create_async_engine(
+            database_url,
+            echo=False,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        enable_sqlite_pragmas(engine.sync_engine)
+        return engine
+    if database_url.startswith("sqlite"):
+        # File databases keep the default pool, one connection per concurrent session
+        engine = create_async_engine(database_url, echo=False)
+        enable_sqlite_pragmas(engine.sync_engine)
+        return engine
+    
+    # Keep a warm pool of connections for server databases
+    return create_async_engine(
+        database_url,
+        echo=False,
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
 
 def create_async_session_factory(engine: AsyncEngine):
     """Create async sessionmaker for given engine"""
@@ -56,7 +116,33 @@ def create_sync_database_engine(database_url: str) -> Engine:
         sync_url = database_url.replace("sqlite+aiosqlite:///", "sqlite:///")
     else:
         sync_url = database_url
-    return create_engine(sync_url, echo=False)
+    if is_sqlite_memory_url(sync_url):
+        # In-memory databases keep SQLAlchemy's per-thread pool, it takes no sizing
+        engine = create_engine(sync_url, echo=False, insertmanyvalues_page_size=1000)
+        enable_sqlite_pragmas(engine)
+        return engine
+    if sync_url.startswith("sqlite"):
+        # Bulk analysis worker threads each hold a connection, keep them pooled
+        engine = create_engine(
+            sync_url,
+            echo=False,
+            pool_size=SYNC_POOL_SIZE,
+            max_overflow=SYNC_POOL_SIZE,
+            # Bulk inserts are sent as multi-row INSERT ... VALUES batches of this size
+            insertmanyvalues_page_size=1000
+        )
+        enable_sqlite_pragmas(engine)
+        return engine
+    
+    return create_engine(
+        sync_url,
+        echo=False,
+        pool_size=SYNC_POOL_SIZE,
+        max_overflow=SYNC_POOL_SIZE,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        insertmanyvalues_page_size=1000
+    )
 
 def create_sync_session_factory(engine: Engine):
     """Create sync sessionmaker for given engine"""
@@ -68,8 +154,9 @@ def create_sync_session_factory(engine: Engine):
         autoflush=False
     )
 
-async def create_database_dependency(session_factory):
-    """Create async database dependency function"""
+@lru_cache(maxsize=None)
+def create_database_dependency(session_factory):
+    """Create async database dependency function (built once per session factory)"""
     async def get_database_session() -> AsyncGenerator[AsyncSession, None]:
         async with session_factory() as session:
             yield session
@@ -89,29 +176,35 @@ AppSessionLocal = create_async_session_factory(app_engine)
 app_sync_engine = create_sync_database_engine(APP_DATABASE_URL)
 AppSyncSessionLocal = create_sync_session_factory(app_sync_engine)
 
-from app.models import metrics, trades_summary
+# Set once the app tables exist, so repeated startups skip the round-trip
+_tables_created = False
 
 async def create_app_tables():
     """Create app database tables for microservice operations"""
-    # Import models to register them with Base.metadata
+    global _tables_created
+    if _tables_created:
+        return
     
     # App database: Microservice-specific tables (metrics, config, etc.)
-    app_tables = ['metrics', 'trades_summary']  # Add microservice tables here
+    app_tables = [Metrics.__table__, TradesSummaryRecord.__table__]  # Add microservice tables here
     if app_tables:
         print("Creating app database tables...")
         async with app_engine.begin() as conn:
             # Create specific tables for the app database
-            await conn.run_sync(Base.metadata.create_all)
-        print(f"App database tables created successfully: {', '.join(app_tables)}")
+            await conn.run_sync(Base.metadata.create_all, tables=app_tables)
+        print(f"App database tables created successfully: {', '.join(table.name for table in app_tables)}")
     else:
         print("No app-specific tables to create")
+    _tables_created = True
 
 # Default database dependency (app database)
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Async dependency to get app database session"""
-    async with AppSessionLocal() as session:
-        yield session 
-
-def get_sync_db() -> Session:
-    """Sync dependency to get app database session"""
-    return AppSyncSessionLocal()
\ No newline at end of file
+get_db = create_database_dependency(AppSessionLocal)
+
+@contextmanager
+def get_sync_db() -> Iterator[Session]:
+    """Sync context manager to get app database session, closed on exit"""
+    session = AppSyncSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
\ No newline at end of file
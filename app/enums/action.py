@@ -6,4 +6,8 @@ from enum import IntEnum
 class Action(IntEnum):
     """Trading action enum with integer values"""
     BUY = 0
-    SELL = 1 
\ No newline at end of file
+    SELL = 1
+
+# Plain int aliases for hot paths, avoiding enum attribute lookups
+BUY = Action.BUY.value
+SELL = Action.SELL.value
@@ -2,8 +2,16 @@
 Main entry point for the FastAPI application
 """
 from contextlib import asynccontextmanager
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load the project .env once, before any service reads os.environ
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from anyio import to_thread
 from fastapi import FastAPI
-from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi.responses import ORJSONResponse
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.api.routes import api_router
 from app.core.config import settings
 from app.db.database import create_app_tables
@@ -17,11 +25,15 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create scheduler instance
-    scheduler: BackgroundScheduler = create_scheduler()
+    scheduler: AsyncIOScheduler = create_scheduler()
     
     # Startup
     logger.info("Starting FastAPI application...")
     
+    # Enlarge the threadpool running sync dependencies (e.g. get_sync_db users);
+    # code executed there must stay CPU-light, heavy work belongs in async paths
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    
     # Create database tables
     await create_app_tables()
     logger.info("Database tables created/verified")
@@ -42,6 +54,7 @@ def create_app() -> FastAPI:
         description=settings.PROJECT_DESCRIPTION,
         version=settings.VERSION,
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        default_response_class=ORJSONResponse,
         lifespan=lifespan
     )
     
@@ -58,5 +71,7 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        loop="uvloop",
+        http="httptools",
+        reload=False
     ) 
\ No newline at end of file
@@ -1,9 +1,20 @@
 """
 Account Pydantic models for API responses and validation
 """
+from dataclasses import dataclass
 from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict
 
+@dataclass(slots=True, frozen=True)
+class Account:
+    """Account record as loaded by the account service, field order matches the data file"""
+    login: int
+    account_size: float
+    platform: int
+    phase: int
+    user_id: int
+    challenge_id: int
+
 class AccountBase(BaseModel):
     """Base account model with shared attributes"""
     login: int = Field(..., description="Account login ID (unique identifier)")
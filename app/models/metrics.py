@@ -2,7 +2,7 @@
 Metrics SQLAlchemy model
 """
 from datetime import date
-from sqlalchemy import Column, Integer, Float, Boolean, Date, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, Float, Boolean, Date, Index, UniqueConstraint, CheckConstraint
 from app.models import Base
 
 class Metrics(Base):
@@ -22,6 +22,13 @@ class Metrics(Base):
     # Compound unique constraint to prevent duplicate metrics for same login on same date
     __table_args__ = (
         UniqueConstraint('login', 'date', name='uq_metrics_login_date'),
+        
+        # Composite index for account lookups and per-account date ranges
+        Index('idx_metrics_login_date', 'login', 'date'),
+        
+        # Index for date-range sweeps across all accounts
+        Index('idx_metrics_date', 'date'),
+        
         # Database-level constraints
         CheckConstraint('win_ratio >= 0 AND win_ratio <= 100', name='check_win_ratio_percentage'),
         CheckConstraint('max_relative_drawdown >= 0 AND max_relative_drawdown <= 100', name='check_max_relative_drawdown_percentage'),
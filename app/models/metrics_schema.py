@@ -7,7 +7,6 @@ from pydantic import (
     BaseModel,
     Field,
     ConfigDict,
-    field_validator,
 )
 
 class MetricsBase(BaseModel):
@@ -42,38 +41,9 @@ class MetricsBase(BaseModel):
         description="Maximum relative drawdown as percentage (0-100)"
     )
 
-    @field_validator('win_ratio', 'max_relative_drawdown')
-    @classmethod
-    def validate_percentage(cls, v):
-        """Validate that percentage values are between 0 and 100"""
-        if not (0 <= v <= 100):
-            raise ValueError('Percentage values must be between 0 and 100')
-        return v
-
-    @field_validator('profit_factor')
-    @classmethod
-    def validate_profit_factor(cls, v):
-        """Validate that profit factor is positive"""
-        if v <= 0:
-            raise ValueError('Profit factor must be positive')
-        return v
-
-    @field_validator('layering')
-    @classmethod
-    def validate_layering(cls, v):
-        """Validate that layering is non-negative"""
-        if v < 0:
-            raise ValueError('Layering must be non-negative')
-        return v
-
-    @field_validator('hft')
-    @classmethod
-    def validate_hft(cls, v):
-        """Validate that hft is non-negative"""
-        if v < 0:
-            raise ValueError('HFT count must be non-negative')
-        return v
-
+# Trust boundary: request bodies must go through full validation, while
+# values computed by our own background jobs are already range-checked and
+# should be built with MetricsCreate.model_construct(**values) instead
 class MetricsCreate(MetricsBase):
     """Schema for creating metrics"""
     pass
@@ -110,38 +80,6 @@ class MetricsUpdate(BaseModel):
         description="Maximum relative drawdown as percentage (0-100)"
     )
 
-    @field_validator('win_ratio', 'max_relative_drawdown')
-    @classmethod
-    def validate_percentage(cls, v):
-        """Validate that percentage values are between 0 and 100"""
-        if v is not None and not (0 <= v <= 100):
-            raise ValueError('Percentage values must be between 0 and 100')
-        return v
-
-    @field_validator('profit_factor')
-    @classmethod
-    def validate_profit_factor(cls, v):
-        """Validate that profit factor is positive"""
-        if v is not None and v <= 0:
-            raise ValueError('Profit factor must be positive')
-        return v
-
-    @field_validator('layering')
-    @classmethod
-    def validate_layering(cls, v):
-        """Validate that layering is non-negative"""
-        if v is not None and v < 0:
-            raise ValueError('Layering must be non-negative')
-        return v
-
-    @field_validator('hft')
-    @classmethod
-    def validate_hft(cls, v):
-        """Validate that hft is non-negative"""
-        if v is not None and v < 0:
-            raise ValueError('HFT count must be non-negative')
-        return v
-
 class MetricsResponse(MetricsBase):
     """Schema for metrics response"""
     id: int
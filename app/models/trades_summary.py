@@ -16,6 +16,21 @@ class TradesSummaryRecord(Base):
     """
     __tablename__ = "trades_summary"
     
+    # Attributes exported by to_dict, in output order
+    _DICT_KEYS = (
+        'trading_account_login',
+        'closed_at',
+        'hft',
+        'win_ratio',
+        'profit_factor',
+        'sl_percent',
+        'layered_trade_count',
+        'last_trade_at',
+        'last_equity',
+        'last_peak',
+        'max_relative_drawdown',
+    )
+    
     # Windowing parameters
     _lower_boundary = Column(DateTime, nullable=False, doc="Window lower boundary")
     _upper_boundary = Column(DateTime, nullable=False, doc="Window upper boundary")
@@ -71,18 +86,4 @@ class TradesSummaryRecord(Base):
     
     def to_dict(self) -> dict:
         """Convert model instance to dictionary"""
-        return {
-            'trading_account_login': self.trading_account_login,
-            'closed_at': self.closed_at,
-            'hft': self.hft,
-            'win_ratio': self.win_ratio,
-            'profit_factor': self.profit_factor,
-            'sl_percent': self.sl_percent,
-            'short_trades_total': self.short_trades_total,
-            'unique_short_timestamps': self.unique_short_timestamps,
-            'layered_trade_count': self.layered_trade_count,
-            'last_trade_at': self.last_trade_at,
-            'last_equity': self.last_equity,
-            'last_peak': self.last_peak,
-            'max_relative_drawdown': self.max_relative_drawdown,
-        } 
\ No newline at end of file
+        return {key: getattr(self, key) for key in self._DICT_KEYS}
\ No newline at end of file
@@ -1,13 +1,16 @@
 """
 User models
 """
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, StringConstraints
+from typing import Annotated, Optional
 from datetime import datetime
 
+# Cheap structural email check for the request hot path (no email-validator parse)
+Email = Annotated[str, StringConstraints(pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$", max_length=254)]
+
 class UserBase(BaseModel):
     """Base user model"""
-    email: EmailStr
+    email: Email
     name: str
     is_active: bool = True
 
@@ -17,7 +20,7 @@ class UserCreate(UserBase):
 
 class UserUpdate(BaseModel):
     """User update model"""
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     name: Optional[str] = None
     is_active: Optional[bool] = None
     password: Optional[str] = None
@@ -1,194 +1,258 @@
 """
-Account Service - Uses Polars to read account data from CSV files
+Account Service - Uses Polars to read account data from Parquet/CSV files
 Provides account lookup functionality with data validation
 """
 import os
+import stat
+from functools import cache
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Tuple
 
 import polars as pl
-from dotenv import load_dotenv
+
+from app.models.account_model import Account
+
+from app.core.config import settings
+
+# Account column types, used for accounts_db.csv and when it is converted to Parquet
+ACCOUNTS_CSV_SCHEMA = {
+    "login": pl.Int64,
+    "account_size": pl.Float64,
+    "platform": pl.Int64,
+    "phase": pl.Int64,
+    "user_id": pl.Int64,
+    "challenge_id": pl.Int64
+}
 
 class AccountServiceError(Exception):
     """Custom exception for account service errors"""
     pass
 
+def _stat(path: Path) -> Optional[os.stat_result]:
+    """
+    Stat path with a single call, None if it can't be stat'ed
+    (missing, a parent is not a directory, no permission), like Path.exists()
+    """
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+@cache
+def _resolve_data_path() -> Path:
+    """
+    Validate DATA_DIR environment variable and return resolved path
+    Cached per process, failures are not cached and will be retried
+
+    Returns:
+        Path: Validated data directory path
+
+    Raises:
+        AccountServiceError: If DATA_DIR is not set or path doesn't exist
+    """
+    # Project root (assuming service is in app/services/), the .env file
+    # itself is loaded once at process start by app.main
+    project_root = Path(__file__).parent.parent.parent
+
+    # Get DATA_DIR from environment
+    data_dir = os.getenv("DATA_DIR")
+    if not data_dir:
+        raise AccountServiceError(
+            "DATA_DIR environment variable is not set. "
+            "Please add DATA_DIR to your .env file (e.g., DATA_DIR=./data)"
+        )
+
+    # Resolve DATA_DIR path relative to project root if it's relative
+    if data_dir.startswith('./') or not os.path.isabs(data_dir):
+        if data_dir.startswith('./'):
+            relative_path = data_dir[2:]
+        else:
+            relative_path = data_dir
+
+        data_path = project_root / relative_path
+    else:
+        data_path = Path(data_dir)
+
+    # Convert to absolute path and validate existence
+    data_path = data_path.resolve()
+    data_stat = _stat(data_path)
+
+    if data_stat is None:
+        raise AccountServiceError(
+            f"DATA_DIR path does not exist: {data_path} "
+            f"(resolved from: {data_dir})"
+        )
+
+    if not stat.S_ISDIR(data_stat.st_mode):
+        raise AccountServiceError(
+            f"DATA_DIR is not a directory: {data_path}"
+        )
+
+    return data_path
+
+def _resolve_accounts_file() -> Path:
+    """
+    Validate that the accounts data exists in the data directory
+    accounts_db.parquet is preferred while it is not older than accounts_db.csv,
+    accounts_db.csv is the fallback. Not cached, the choice follows file updates
+
+    Returns:
+        Path: Path to accounts_db.parquet or accounts_db.csv file
+
+    Raises:
+        AccountServiceError: If neither file exists
+    """
+    data_path = _resolve_data_path()
+    parquet_file = data_path / "accounts_db.parquet"
+    accounts_file = data_path / "accounts_db.csv"
+    parquet_stat = _stat(parquet_file)
+    csv_stat = _stat(accounts_file)
+
+    if parquet_stat is not None and stat.S_ISREG(parquet_stat.st_mode) and (
+        csv_stat is None or parquet_stat.st_mtime_ns >= csv_stat.st_mtime_ns
+    ):
+        return parquet_file
+
+    if csv_stat is None:
+        raise AccountServiceError(
+            f"accounts_db.csv not found in DATA_DIR: {accounts_file}. "
+            f"Please ensure the file exists or run preprocessing script first."
+        )
+
+    if not stat.S_ISREG(csv_stat.st_mode):
+        raise AccountServiceError(
+            f"accounts_db.csv is not a file: {accounts_file}"
+        )
+
+    return accounts_file
+
 class AccountService:
     """Service for reading and querying account data using Polars"""
     
+    # Columns exposed by the account models, everything else is never parsed
+    _DEFAULT_COLS = ["login", "account_size", "platform", "phase", "user_id", "challenge_id"]
+    
     def __init__(self):
         """Initialize account service with data validation"""
-        self._data_path = self._validate_and_get_data_path()
-        self._accounts_file = self._validate_accounts_file()
+        self._data_path = _resolve_data_path()
+        self._accounts_file = _resolve_accounts_file()
+        self._accounts_by_login: Dict[int, Account] = {}
+        # (accounts file, its mtime in ns) the login index was built from
+        self._loaded_source: Optional[Tuple[Path, int]] = None
+        self.reload()
     
-    def _validate_and_get_data_path(self) -> Path:
+    def _load_accounts(self) -> pl.DataFrame:
         """
-        Validate DATA_DIR environment variable and return resolved path
+        Read the accounts file into memory using Polars lazy scanning
         
         Returns:
-            Path: Validated data directory path
+            pl.DataFrame: All account records, one row per login
             
         Raises:
-            AccountServiceError: If DATA_DIR is not set or path doesn't exist
+            AccountServiceError: If there's an error reading the accounts file
         """
-        # Load environment variables
-        # Try to find .env file in project root (assuming service is in app/services/)
-        current_dir = Path(__file__).parent
-        project_root = current_dir.parent.parent
-        env_file = project_root / ".env"
-        
-        if env_file.exists():
-            load_dotenv(env_file)
-        
-        # Get DATA_DIR from environment
-        data_dir = os.getenv("DATA_DIR")
-        if not data_dir:
-            raise AccountServiceError(
-                "DATA_DIR environment variable is not set. "
-                "Please add DATA_DIR to your .env file (e.g., DATA_DIR=./data)"
-            )
-        
-        # Resolve DATA_DIR path relative to project root if it's relative
-        if data_dir.startswith('./') or not os.path.isabs(data_dir):
-            if data_dir.startswith('./'):
-                relative_path = data_dir[2:]
+        try:
+            if self._accounts_file.suffix == ".parquet":
+                accounts_scan = pl.scan_parquet(self._accounts_file)
             else:
-                relative_path = data_dir
+                # Known dtypes, no inference pass (unused columns stay String)
+                accounts_scan = pl.scan_csv(
+                    self._accounts_file,
+                    schema_overrides=ACCOUNTS_CSV_SCHEMA,
+                    infer_schema=False
+                )
             
-            data_path = project_root / relative_path
-        else:
-            data_path = Path(data_dir)
-        
-        # Convert to absolute path and validate existence
-        data_path = data_path.resolve()
-        
-        if not data_path.exists():
-            raise AccountServiceError(
-                f"DATA_DIR path does not exist: {data_path} "
-                f"(resolved from: {data_dir})"
+            # Large files are processed in bounded-memory chunks, small ones in one pass
+            if self._accounts_file.stat().st_size >= settings.ACCOUNTS_STREAMING_MIN_BYTES:
+                engine = "streaming"
+            else:
+                engine = "auto"
+            
+            return (
+                accounts_scan
+                .select(self._DEFAULT_COLS)  # Projection pushdown into the scan
+                .unique(subset="login", keep="first", maintain_order=True)  # login should be unique
+                .sort("login")
+                .collect(engine=engine)
             )
-        
-        if not data_path.is_dir():
+            
+        except (OSError, pl.exceptions.PolarsError) as e:
             raise AccountServiceError(
-                f"DATA_DIR is not a directory: {data_path}"
-            )
+                f"Error reading accounts data from {self._accounts_file}: {str(e)}"
+            ) from e
+    
+    def _get_source(self) -> Tuple[Path, int]:
+        """Get the accounts file currently in use and its modification time in ns"""
+        accounts_file = _resolve_accounts_file()
+        accounts_stat = _stat(accounts_file)
+        return accounts_file, accounts_stat.st_mtime_ns if accounts_stat is not None else 0
+    
+    def reload(self) -> None:
+        """
+        (Re)load the accounts file and rebuild the in-memory login index
         
-        return data_path
+        Raises:
+            AccountServiceError: If there's an error reading the accounts file
+        """
+        source = self._get_source()
+        self._accounts_file = source[0]
+        accounts_df = self._load_accounts()
+        # Rows come out in _DEFAULT_COLS order, the same as the Account fields
+        self._accounts_by_login = {row[0]: Account(*row) for row in accounts_df.iter_rows()}
+        self._loaded_source = source
     
-    def _validate_accounts_file(self) -> Path:
+    def reload_if_changed(self) -> bool:
         """
-        Validate that accounts_db.csv exists in the data directory
+        Reload the accounts if the accounts file was replaced or modified since the last load
         
         Returns:
-            Path: Path to accounts_db.csv file
+            True if the accounts were reloaded
             
         Raises:
-            AccountServiceError: If accounts_db.csv doesn't exist
+            AccountServiceError: If there's an error reading the accounts file
         """
-        accounts_file = self._data_path / "accounts_db.csv"
-        
-        if not accounts_file.exists():
-            raise AccountServiceError(
-                f"accounts_db.csv not found in DATA_DIR: {accounts_file}. "
-                f"Please ensure the file exists or run preprocessing script first."
-            )
-        
-        if not accounts_file.is_file():
-            raise AccountServiceError(
-                f"accounts_db.csv is not a file: {accounts_file}"
-            )
-        
-        return accounts_file
+        if self._get_source() == self._loaded_source:
+            return False
+        self.reload()
+        return True
     
-    def get_account_by_login(self, login: int) -> Optional[Dict[str, Any]]:
+    def get_account_by_login(self, login: int) -> Optional[Account]:
         """
-        Get account data by login using Polars lazy scanning
+        Get account data by login from the in-memory login index
         
         Args:
             login: Account login ID to search for
             
         Returns:
-            Dict[str, Any]: Account data if found, None otherwise
-            
-        Raises:
-            AccountServiceError: If there's an error reading the CSV file
+            Account: Account data if found, None otherwise
         """
-        try:
-            # Use lazy scanning for efficient filtering
-            account_query = (
-                pl.scan_csv(self._accounts_file)
-                .filter(pl.col("login") == login)
-                .limit(1)  # Only need first match since login should be unique
-            )
-            
-            # Execute the lazy query
-            result_df = account_query.collect()
-            
-            # Return None if no account found
-            if result_df.is_empty():
-                return None
-            
-            # Convert first row to dictionary
-            account_data = result_df.to_dicts()[0]
-            return account_data
-            
-        except pl.exceptions.PolarsError as e:
-            raise AccountServiceError(
-                f"Error reading accounts data from {self._accounts_file}: {str(e)}"
-            )
-        except Exception as e:
-            raise AccountServiceError(
-                f"Unexpected error while querying account data: {str(e)}"
-            )
+        return self._accounts_by_login.get(login)
     
     def get_all_unique_logins(self) -> list[int]:
         """
-        Get all unique login IDs from the accounts database using Polars lazy API
+        Get all unique login IDs from the in-memory login index
         
         Returns:
-            list[int]: List of unique login IDs
-            
-        Raises:
-            AccountServiceError: If there's an error reading the CSV file
+            list[int]: List of unique login IDs, in ascending order
         """
-        try:
-            # Use lazy scanning for efficient processing
-            unique_logins_query = (
-                pl.scan_csv(self._accounts_file)
-                .select(pl.col("login"))  # Select only the login column
-                .unique()  # Get unique values
-            )
-            
-            # Execute the lazy query and collect results
-            result_df = unique_logins_query.collect()
-            
-            # Convert to list of integers
-            unique_logins = result_df["login"].to_list()
-            return unique_logins
-            
-        except pl.exceptions.PolarsError as e:
-            raise AccountServiceError(
-                f"Error reading accounts data from {self._accounts_file}: {str(e)}"
-            )
-        except Exception as e:
-            raise AccountServiceError(
-                f"Unexpected error while querying unique logins: {str(e)}"
-            )
+        return list(self._accounts_by_login)
 
     def get_data_path(self) -> Path:
         """Get the validated data directory path"""
         return self._data_path
     
     def get_accounts_file_path(self) -> Path:
-        """Get the path to the accounts CSV file"""
+        """Get the path to the accounts data file (Parquet or CSV)"""
         return self._accounts_file
     
+@cache
 def create_account_service() -> AccountService:
     """
-    Create and return an AccountService instance
+    Return the process-wide AccountService instance, created on first call
+    The login index is only rebuilt by reload()/reload_if_changed()
     
     Returns:
-        AccountService: Configured account service instance
+        AccountService: Shared account service instance
         
     Raises:
         AccountServiceError: If service initialization fails
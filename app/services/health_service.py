@@ -2,31 +2,48 @@
 Health service with business logic
 """
 from datetime import datetime
+import orjson
 from app.models.health import HealthResponse
 from app.core.config import settings
 
 class HealthService:
     """Health service for handling health checks"""
     
+    # Constant parts of every health response, only the timestamp changes
+    _BASE_STATUS = {
+        "status": "healthy",
+        "version": settings.VERSION
+    }
+    _DETAILS = {
+        "database": "connected",
+        "memory_usage": "normal",
+        "cpu_usage": "normal"
+    }
+    # Serialized HealthResponse around the timestamp, same field order as the model
+    _STATUS_JSON_PREFIX = (
+        b'{"status":' + orjson.dumps(_BASE_STATUS["status"]) + b',"timestamp":"'
+    )
+    _STATUS_JSON_SUFFIX = (
+        b'","version":' + orjson.dumps(_BASE_STATUS["version"]) + b',"details":{}}'
+    )
+    
     def get_health_status(self) -> HealthResponse:
         """Get basic health status"""
-        return HealthResponse(
-            status="healthy",
-            timestamp=datetime.now(),
-            version=settings.VERSION
+        # Values are trusted constants, skip validation
+        return HealthResponse.model_construct(
+            **self._BASE_STATUS,
+            timestamp=datetime.now()
         )
     
+    def get_health_status_json(self) -> bytes:
+        """Get basic health status already serialized as JSON"""
+        timestamp = datetime.now().isoformat().encode()
+        return self._STATUS_JSON_PREFIX + timestamp + self._STATUS_JSON_SUFFIX
+    
     def get_detailed_health_status(self) -> HealthResponse:
         """Get detailed health status with additional information"""
-        details = {
-            "database": "connected",
-            "memory_usage": "normal",
-            "cpu_usage": "normal"
-        }
-        
-        return HealthResponse(
-            status="healthy",
+        return HealthResponse.model_construct(
+            **self._BASE_STATUS,
             timestamp=datetime.utcnow(),
-            version=settings.VERSION,
-            details=details
-        ) 
\ No newline at end of file
+            details=self._DETAILS
+        )
\ No newline at end of file
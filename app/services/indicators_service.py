@@ -9,6 +9,7 @@ from datetime import (
 )
 
 import tempfile
+from functools import cache
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from polars import (
@@ -16,22 +17,34 @@ from polars import (
     col,
     lit,
     when,
-    count,
+    coalesce,
     read_parquet,
     scan_csv,
     DataFrame
 )       
-from sqlalchemy import select
-from app.enums.action import Action
+from sqlalchemy import and_, func, insert, select
+from app.enums.action import BUY
 from app.models.trades_summary import TradesSummaryRecord
-from app.services.trade_service import TradeService
+from app.services.trade_service import TradeService, TradeServiceError
 from app.services.account_service import create_account_service
-from app.db.database import get_sync_db
+from app.db.database import AppSyncSessionLocal, get_sync_db
 from os import cpu_count
 
 # Time threshold to consider analysis up-to-date (in minutes)
 ANALYSIS_UPTODATE_THRESHOLD_MINUTES = 1
 
+# Accounts submitted to the bulk analysis thread pool at a time
+BULK_ANALYSIS_PAGE_SIZE = 64
+
+# Accounts with at least this many trades use the batch strategy
+BATCH_STRATEGY_MIN_TRADES = 1000
+
+# Trade columns read by get_all_trading_indicators()
+INDICATOR_TRADE_COLUMNS = [
+    "opened_at", "closed_at", "duration_s", "profit", "lot_size", "contract_size",
+    "open_price", "price_sl", "close_price", "action"
+]
+
 class IndicatorsServiceError(Exception):
     """Custom exception for indicators service errors"""
     pass
@@ -68,8 +81,7 @@ class IndicatorsService:
             The most recent TradesSummaryRecord or None if not found
         """
         try:
-            session = get_sync_db()
-            try:
+            with get_sync_db() as session:
                 result = session.execute(
                     select(TradesSummaryRecord)
                     .where(TradesSummaryRecord.trading_account_login == account_login)
@@ -77,11 +89,70 @@ class IndicatorsService:
                     .limit(1)
                 )
                 return result.scalar_one_or_none()
-            finally:
-                session.close()
         except Exception as e:
             raise IndicatorsServiceError(f"Failed to get trades summary for login {account_login}: {str(e)}")
 
+    def get_latest_trades_summaries_sync(
+        self,
+        account_logins: Optional[List[int]] = None
+    ) -> Dict[int, TradesSummaryRecord]:
+        """
+        Get the most recent trades summary record of many accounts in one query
+        
+        Args:
+            account_logins: Accounts to include, every account if None
+            
+        Returns:
+            Dict mapping trading account login to its most recent TradesSummaryRecord
+        """
+        latest = select(
+            TradesSummaryRecord.trading_account_login,
+            func.max(TradesSummaryRecord.closed_at).label("closed_at")
+        )
+        if account_logins is not None:
+            latest = latest.where(TradesSummaryRecord.trading_account_login.in_(account_logins))
+        latest = latest.group_by(TradesSummaryRecord.trading_account_login).subquery()
+        try:
+            with get_sync_db() as session:
+                result = session.execute(
+                    select(TradesSummaryRecord).join(
+                        latest,
+                        and_(
+                            TradesSummaryRecord.trading_account_login == latest.c.trading_account_login,
+                            TradesSummaryRecord.closed_at == latest.c.closed_at
+                        )
+                    )
+                )
+                return {record.trading_account_login: record for record in result.scalars()}
+        except Exception as e:
+            raise IndicatorsServiceError(f"Failed to get latest trades summaries: {str(e)}")
+
+    def prefetch_analysis_inputs(self, account_logins: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch the inputs of determine_analysis_strategy for many accounts at once,
+        one summary query and one trades scan instead of three lookups per account
+        
+        Args:
+            account_logins: The trading account login IDs
+            
+        Returns:
+            Dict keyed by login with "last_record", "last_trade_timestamp" and "record_count"
+        """
+        last_records = self.get_latest_trades_summaries_sync(account_logins)
+        try:
+            trade_stats = self.trade_service.get_trade_stats_by_account(account_logins)
+        except Exception as e:
+            raise IndicatorsServiceError(f"Failed to get trade stats: {str(e)}")
+        
+        return {
+            account_login: {
+                "last_record": last_records.get(account_login),
+                "last_trade_timestamp": trade_stats.get(account_login, (None, 0))[0],
+                "record_count": trade_stats.get(account_login, (None, 0))[1]
+            }
+            for account_login in account_logins
+        }
+
     def get_most_recent_trade_timestamp(self, account_login: int) -> Optional[datetime]:
         """
         Get the timestamp of the most recent trade for an account using TradeService
@@ -123,13 +194,14 @@ class IndicatorsService:
         
         return time_difference <= threshold_delta
 
-    def _insert_records_sync(self, records: List[TradesSummaryRecord]) -> int:
+    def _insert_records_sync(self, records: List[Dict[str, Any]]) -> int:
         """
         Thread-safe synchronous method to insert records to database
         Assumes records are already filtered for new data only (no duplicates expected)
+        Uses a Core executemany insert, bypassing the ORM unit of work
         
         Args:
-            records: List of TradesSummaryRecord objects to insert
+            records: List of trades_summary rows (column name -> value) to insert
             
         Returns:
             Number of records inserted
@@ -138,47 +210,49 @@ class IndicatorsService:
             return 0
             
         try:
-            session = get_sync_db()
-            try:
-                # Direct bulk insert - no duplicate checking needed
-                # The resumable computation logic should ensure no duplicates
-                session.add_all(records)
-                session.commit()
-                return len(records)
-                
-            except Exception as e:
-                session.rollback()
-                # If we get a unique constraint error, it means our resumable logic has a bug
-                if "UNIQUE constraint failed" in str(e):
-                    raise IndicatorsServiceError(
-                        f"Duplicate record detected - this indicates a bug in resumable computation logic. "
-                        f"Error: {str(e)}"
-                    )
-                raise
-            finally:
-                session.close()
+            # Direct bulk insert - no duplicate checking needed
+            # The resumable computation logic should ensure no duplicates
+            # One transaction for the whole batch, committed on exit, rolled back on error
+            with AppSyncSessionLocal.begin() as session:
+                session.execute(insert(TradesSummaryRecord.__table__), records)
+            return len(records)
+            
         except Exception as e:
+            # If we get a unique constraint error, it means our resumable logic has a bug
+            if "UNIQUE constraint failed" in str(e):
+                raise IndicatorsServiceError(
+                    f"Failed to insert records: Duplicate record detected - this indicates a bug "
+                    f"in resumable computation logic. Error: {str(e)}"
+                )
             raise IndicatorsServiceError(f"Failed to insert records: {str(e)}")
 
     def _get_all_account_logins(self) -> List[int]:
         """
-        Get all account logins from the account service
+        Get all account logins from the account service, reloading the
+        accounts first if the accounts file changed since they were loaded
         
         Returns:
             List of all unique account login IDs
         """
         try:
             account_service = create_account_service()
+            account_service.reload_if_changed()
             return account_service.get_all_unique_logins()
         except Exception as e:
             raise IndicatorsServiceError(f"Error getting account logins: {str(e)}")
 
-    def determine_analysis_strategy(self, account_login: int) -> Dict[str, Any]:
+    def determine_analysis_strategy(
+        self,
+        account_login: int,
+        prefetched: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Determine whether to run rolling window analysis from scratch or resume it
         
         Args:
             account_login: The trading account login ID
+            prefetched: This account's entry from prefetch_analysis_inputs, skips the
+                per-account lookups when given
             
         Returns:
             Dict containing analysis strategy decision with following keys:
@@ -193,15 +267,21 @@ class IndicatorsService:
         try:
             print(f"🔍 Analyzing strategy for account {account_login}...")
             
-            # Step 1: Check if we have any existing trades summary records
-            last_record = self.get_trades_summary_by_login_sync(account_login)
-            
-            # Step 2: Get the most recent trade timestamp
-            latest_trade_timestamp = self.get_most_recent_trade_timestamp(account_login)
-            
-            # Step 3: Count number of records for this account
-            record_count = self.trade_service.count_trades_for_account(account_login)
-            use_batch_strategy = record_count >= 1000
+            if prefetched is not None:
+                last_record = prefetched["last_record"]
+                latest_trade_timestamp = prefetched["last_trade_timestamp"]
+                use_batch_strategy = prefetched["record_count"] >= BATCH_STRATEGY_MIN_TRADES
+            else:
+                # Step 1: Check if we have any existing trades summary records
+                last_record = self.get_trades_summary_by_login_sync(account_login)
+                
+                # Step 2: Get the most recent trade timestamp
+                latest_trade_timestamp = self.get_most_recent_trade_timestamp(account_login)
+                
+                # Step 3: Check whether the account has enough trades for batch processing
+                use_batch_strategy = self.trade_service.has_at_least_n_trades(
+                    account_login, BATCH_STRATEGY_MIN_TRADES
+                )
             
             # Step 4: Make decision based on available data
             if last_record is None:
@@ -280,24 +360,10 @@ class IndicatorsService:
             account_login: The trading account login ID
         """
         if not trades_summary_records.is_empty():
-            records_to_insert = []
-            for row in trades_summary_records.iter_rows(named=True):
-                record = TradesSummaryRecord(
-                    _lower_boundary=row["_lower_boundary"],
-                    _upper_boundary=row["_upper_boundary"],
-                    trading_account_login=account_login,
-                    closed_at=row["closed_at"],
-                    hft=row["hft"],
-                    win_ratio=row["win_ratio"],
-                    profit_factor=row["profit_factor"],
-                    sl_percent=row["sl_percent"],
-                    layered_trade_count=row["layered_trade_count"],
-                    last_trade_at=row["last_trade_at"],
-                    last_equity=row["last_equity"],
-                    last_peak=row["last_peak"],
-                    max_relative_drawdown=row["max_relative_drawdown"]
-                )
-                records_to_insert.append(record)
+            # Add the login as a column and convert all rows in one pass
+            records_to_insert = trades_summary_records.with_columns(
+                lit(account_login).alias("trading_account_login")
+            ).to_dicts()
             self._insert_records_sync(records_to_insert)
 
     def _process_from_scratch(self, account_login: int, batch_strategy: bool) -> None:
@@ -311,21 +377,24 @@ class IndicatorsService:
         group_by = self.trade_service.create_rolling_window_lazy_frame(
             account_login=account_login,
             period="1m",
-            equity=100_000
+            equity=100_000,
+            columns=INDICATOR_TRADE_COLUMNS,
+            row_columns=_TRADE_ROW_COLUMNS
         )
 
         if group_by is None:
             print(f"❌ fail to create rolling window lazy frame for account {account_login}")
             return
         
-        indicators = get_all_trading_indicators()
+        indicators = _ALL_INDICATORS
         trades_summary_records = group_by.agg(indicators)
         
         if batch_strategy:
             # TODO: Implement batch processing for from_scratch
             pass
         else:
-            trades_summary_records = trades_summary_records.collect()
+            # Streaming engine keeps peak memory at chunk size while scanning trades
+            trades_summary_records = trades_summary_records.collect(engine="streaming")
             self._process_trades_summary_records(trades_summary_records, account_login)
 
     def _process_resume(self, account_login: int, strategy_info: Dict[str, Any], batch_strategy: bool) -> None:
@@ -343,14 +412,16 @@ class IndicatorsService:
             period_seconds=strategy_info["period_seconds"],
             resume_from_equity=strategy_info["last_record"].last_equity,
             resume_from_peak=strategy_info["last_record"].last_peak,
-            resume_from_datetime=strategy_info["last_record"].closed_at
+            resume_from_datetime=strategy_info["last_record"].closed_at,
+            columns=INDICATOR_TRADE_COLUMNS,
+            row_columns=_TRADE_ROW_COLUMNS
         )
 
         if group_by is None:
             print(f"❌ fail to create rolling window lazy frame for account {account_login}")
             return
         
-        indicators = get_all_trading_indicators()
+        indicators = _ALL_INDICATORS
 
         trades_summary_records = group_by.agg(indicators)
 
@@ -358,22 +429,28 @@ class IndicatorsService:
             # TODO: Implement batch processing for resume
             pass
         else:
-            trades_summary_records = trades_summary_records.collect()
+            # Streaming engine keeps peak memory at chunk size while scanning trades
+            trades_summary_records = trades_summary_records.collect(engine="streaming")
             self._process_trades_summary_records(trades_summary_records, account_login)
 
-    def process_account_by_strategy(self, account_login: int) -> Dict[str, Any]:
+    def process_account_by_strategy(
+        self,
+        account_login: int,
+        prefetched: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Process an account based on the analysis strategy decision.
         Uses a match statement over the 'strategy' key from determine_analysis_strategy.
         
         Args:
             account_login: The trading account login ID
+            prefetched: Optional prefetched strategy inputs (see prefetch_analysis_inputs)
             
         Returns:
             Dict containing the strategy information and processing status
         """
         try:
-            strategy_info = self.determine_analysis_strategy(account_login)
+            strategy_info = self.determine_analysis_strategy(account_login, prefetched)
             strategy = strategy_info["strategy"]
             reason = strategy_info["reason"]
             batch_strategy = strategy_info.get("use_batch_strategy", False)
@@ -417,11 +494,17 @@ class IndicatorsService:
             - errors: List of error messages for failed accounts
         """
         try:
+            # Per-account scans read from the partitioned Parquet store, refreshed
+            # once per run; on failure they fall back to scanning trades_db.csv
+            try:
+                self.trade_service.ensure_trades_store()
+            except TradeServiceError as e:
+                print(f"⚠️  Parquet trades store unavailable, using CSV: {str(e)}")
+            
             # Get list of accounts to process
             if account_logins is None:
                 # Get all account logins from account service
-                account_service = create_account_service()
-                account_logins = account_service.get_all_unique_logins()[:20]
+                account_logins = self._get_all_account_logins()
             
             print(f"🔄 Starting bulk analysis for {len(account_logins)} accounts...")
             
@@ -433,32 +516,46 @@ class IndicatorsService:
             
             # Create thread pool
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit all accounts for processing
-                future_to_account = {
-                    executor.submit(self.process_account_by_strategy, account_login): account_login
-                    for account_login in account_logins
-                }
-                
-                # Process results as they complete
-                for future in as_completed(future_to_account):
-                    account_login = future_to_account[future]
+                # Accounts go through in pages, bounding in-flight futures and prefetched state
+                for page_start in range(0, len(account_logins), BULK_ANALYSIS_PAGE_SIZE):
+                    page = account_logins[page_start:page_start + BULK_ANALYSIS_PAGE_SIZE]
+                    
+                    # Strategy inputs for the whole page, fetched in bulk up front; if that
+                    # fails each account falls back to its own lookups
                     try:
-                        # Process the account and get the strategy info
-                        strategy_info = future.result()
-                        strategy = strategy_info.get("strategy")
-                        
-                        if strategy == "skip":
-                            skipped += 1
-                            print(f"⏭️  Skipped account {account_login}: {strategy_info.get('reason', 'No reason provided')}")
-                        else:
-                            processed += 1
-                            print(f"✅ Processed account {account_login}: {strategy_info.get('reason', 'No reason provided')}")
+                        prefetched = self.prefetch_analysis_inputs(page)
+                    except IndicatorsServiceError as e:
+                        print(f"⚠️  Prefetch failed, looking up accounts one by one: {str(e)}")
+                        prefetched = {}
+                    
+                    # Submit the page's accounts for processing
+                    future_to_account = {
+                        executor.submit(
+                            self.process_account_by_strategy, account_login, prefetched.get(account_login)
+                        ): account_login
+                        for account_login in page
+                    }
+                    
+                    # Process results as they complete
+                    for future in as_completed(future_to_account):
+                        account_login = future_to_account[future]
+                        try:
+                            # Process the account and get the strategy info
+                            strategy_info = future.result()
+                            strategy = strategy_info.get("strategy")
                             
-                    except Exception as e:
-                        failed += 1
-                        error_msg = f"Account {account_login} failed: {str(e)}"
-                        errors.append(error_msg)
-                        print(f"❌ {error_msg}")
+                            if strategy == "skip":
+                                skipped += 1
+                                print(f"⏭️  Skipped account {account_login}: {strategy_info.get('reason', 'No reason provided')}")
+                            else:
+                                processed += 1
+                                print(f"✅ Processed account {account_login}: {strategy_info.get('reason', 'No reason provided')}")
+                                
+                        except Exception as e:
+                            failed += 1
+                            error_msg = f"Account {account_login} failed: {str(e)}"
+                            errors.append(error_msg)
+                            print(f"❌ {error_msg}")
             
             print(f"✅ Bulk analysis completed:")
             print(f"   - Processed: {processed} accounts")
@@ -476,9 +573,17 @@ class IndicatorsService:
             raise IndicatorsServiceError(f"Failed to execute bulk analysis: {str(e)}")
 
 
+@cache
+def _get_default_indicators_service() -> IndicatorsService:
+    """Process-wide IndicatorsService on the shared TradeService, created on first use"""
+    return IndicatorsService()
+
+
 def create_indicators_service(trade_service: Optional[TradeService] = None) -> IndicatorsService:
     """
     Create and return an IndicatorsService instance
+    Without a trade_service the process-wide instance is returned (the scheduler's
+    per-tick call reuses it), with one a new instance is built around it
     
     Args:
         trade_service: Optional TradeService instance (will create one if not provided)
@@ -489,20 +594,36 @@ def create_indicators_service(trade_service: Optional[TradeService] = None) -> I
     Raises:
         IndicatorsServiceError: If service initialization fails
     """
+    if trade_service is None:
+        return _get_default_indicators_service()
     return IndicatorsService(trade_service)
 
 
+def get_trade_row_columns() -> List[Expr]:
+    """
+    Per-trade helper columns used by the indicator expressions, computed once
+    per trade on the frame before it is grouped into windows
+    
+    Returns:
+        List[pl.Expr]: Polars expressions adding the helper columns
+    """
+    return [
+        # Short-duration trade (< 60 seconds), used by HFT and layering
+        (col("duration_s") < 60).alias("_is_short"),
+        *get_weighted_sl_row_columns()
+    ]
+
+
 def get_hft_count_filters() -> List[Expr]:
     """
     Calculate HFT count by counting trades with duration less than 60 seconds
+    Requires the get_trade_row_columns() columns
     
     Returns:
         List[pl.Expr]: Polars expressions to calculate HFT count
     """
     return [
-        when(
-            (col("closed_at") - col("opened_at")).dt.total_seconds() < 60
-        ).then(1).otherwise(0).sum().alias("hft")
+        col("_is_short").sum().alias("hft")
     ]
 
 
@@ -511,7 +632,8 @@ def get_win_ratio_filters() -> List[Expr]:
     Calculate the win rate for a given lazy frame
     """
     return [
-        (when(col("profit") > 0).then(1).otherwise(0).sum() / count()).alias("win_ratio")
+        # Expr.len() counts every trade in the window (pl.count() is deprecated)
+        ((col("profit") > 0).sum() / col("profit").len()).alias("win_ratio")
     ]
 
 
@@ -520,8 +642,8 @@ def get_profit_factor_filters() -> List[Expr]:
     Calculate the profit factor for a given lazy frame
     Handles edge cases: returns 0 if no winning trades or no losing trades
     """
-    gross_profit = when(col("profit") > 0).then(col("profit")).otherwise(0).sum()
-    gross_loss = when(col("profit") < 0).then(col("profit").abs()).otherwise(0).sum()
+    gross_profit = col("profit").clip(lower_bound=0).sum()
+    gross_loss = col("profit").clip(upper_bound=0).abs().sum()
     
     return [
         when(gross_profit == 0)
@@ -544,46 +666,44 @@ def get_max_relative_drawdown_filter() -> List[Expr]:
     ]
 
 
-def get_weighted_sl_percent_filters() -> List[Expr]:
+def get_weighted_sl_row_columns() -> List[Expr]:
     """
-    Calculate the weighted stop loss percentage based on position size
+    Per-trade position size and position-weighted stop loss percentage
     
     Logic:
     - If price_sl is not null: compute sl% using open_price and price_sl
     - If price_sl is null: infer sl% using open_price and close_price
     - Position size = lot_size * contract_size * open_price
     - Action: 0 = BUY, 1 = SELL
-    - Weighted sl% = sum(sl_percent * position_size) / sum(position_size)
     """
     
     # Calculate position size
-    position_size = col("lot_size") * col("contract_size") * col("open_price")
+    units = col("lot_size") * col("contract_size")
+    position_size = units * col("open_price")
     
-    # Calculate sl_percent based on whether price_sl is null or not
+    # Stop price is price_sl when set, otherwise inferred from close_price
     # For BUY trades (action = 0): sl% = (open_price - sl_price) / open_price  
     # For SELL trades (action = 1): sl% = (sl_price - open_price) / open_price
+    sl_price = coalesce([col("price_sl"), col("close_price")])
+    direction = when(col("action") == BUY).then(1.0).otherwise(-1.0)
     
-    sl_percent = (
-        when(col("price_sl").is_not_null())
-        .then(
-            # Use price_sl when available
-            when(col("action") == Action.BUY.value)  # BUY 
-            .then((col("open_price") - col("price_sl")) / col("open_price"))
-            .otherwise((col("price_sl") - col("open_price")) / col("open_price"))  # SELL
-        )
-        .otherwise(
-            # Infer from close_price when price_sl is null
-            when(col("action") == Action.BUY.value)  # BUY     
-            .then((col("open_price") - col("close_price")) / col("open_price"))
-            .otherwise((col("close_price") - col("open_price")) / col("open_price"))  # SELL
-        )
-    )
-    
-    # Calculate weighted sl percentage
-    weighted_sl_percent = (sl_percent * position_size).sum() / position_size.sum()
+    # sl% * position_size, with open_price cancelled out of the division
+    weighted_sl = direction * (col("open_price") - sl_price) * units
     
     return [
-        weighted_sl_percent.alias("sl_percent")
+        position_size.alias("_position_size"),
+        weighted_sl.alias("_weighted_sl")
+    ]
+
+
+def get_weighted_sl_percent_filters() -> List[Expr]:
+    """
+    Calculate the weighted stop loss percentage based on position size
+    Weighted sl% = sum(sl_percent * position_size) / sum(position_size)
+    Requires the get_trade_row_columns() columns
+    """
+    return [
+        (col("_weighted_sl").sum() / col("_position_size").sum()).alias("sl_percent")
     ]
 
 
@@ -597,25 +717,20 @@ def get_layered_trade_filters() -> List[Expr]:
     Layered trades are short-duration trades that happen simultaneously,
     indicating potential high-frequency trading strategies.
     
-    Approach: Create a helper column with opened_at only for short trades,
-    then count unique timestamps and compare with total short trades.
+    Approach: Count short trades and their unique opening timestamps,
+    the difference is the number of layered trades (0 with no short trades).
+    Requires the get_trade_row_columns() columns
     """
-    # Define the condition for short trades (< 60 seconds duration)
-    is_short_duration = (col("closed_at") - col("opened_at")).dt.total_seconds() < 60
+    # Short trades (< 60 seconds duration), precomputed per trade
+    is_short_duration = col("_is_short")
+    
+    short_trades_total = is_short_duration.sum()
+    unique_short_timestamps = col("opened_at").filter(is_short_duration).n_unique()
     
     return [
-        
         # Layered trades = short_trades_total - unique_timestamps  
         # If we have more trades than unique timestamps, the difference is layered trades
-        # Handle edge case: if no short trades exist, return 0
-        when(
-            when(is_short_duration).then(1).otherwise(0).sum() == 0
-        )
-        .then(0)  # No short trades = no layered trades
-        .otherwise(
-            when(is_short_duration).then(1).otherwise(0).sum() -     
-            when(is_short_duration).then(col("opened_at")).otherwise(None).drop_nulls().n_unique()
-        )
+        (short_trades_total - unique_short_timestamps)
         .clip(lower_bound=0)  # Ensure non-negative
         .alias("layered_trade_count")
     ]
@@ -652,3 +767,7 @@ def get_all_trading_indicators() -> List[Expr]:
     
     return expressions
 
+
+# Expressions are immutable, build them once and share them across accounts
+_TRADE_ROW_COLUMNS = get_trade_row_columns()
+_ALL_INDICATORS = get_all_trading_indicators()
@@ -1,28 +1,108 @@
 """
-Trade Service - Uses Polars to read trade data from CSV files
+Trade Service - Uses Polars to read trade data from a partitioned Parquet store or CSV
 Provides trade data access functionality with data validation
 """
 import os
+import shutil
+from functools import cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 import polars as pl
 from polars.lazyframe.group_by import LazyGroupBy
-from polars import LazyFrame, col, when, lit
-from dotenv import load_dotenv
+from polars import Expr, LazyFrame, col, when, lit
+
+# trades_db.csv column types, so the scanner skips schema inference
+# and parses opened_at/closed_at into datetimes while reading
+TRADES_CSV_SCHEMA = {
+    "identifier": pl.Int64,
+    "trading_account_login": pl.Int64,
+    "action": pl.Int8,
+    "opened_at": pl.Datetime("us"),
+    "closed_at": pl.Datetime("us"),
+    "open_price": pl.Float64,
+    "close_price": pl.Float64,
+    "price_sl": pl.Float64,
+    "lot_size": pl.Float64,
+    "contract_size": pl.Float64,
+    "profit": pl.Float64,
+    "swap": pl.Float64,
+    "commission": pl.Float64
+}
+
+# Written into the Parquet store once it is complete. Bump the version whenever the
+# stored columns change, stores without the current marker are rebuilt
+TRADES_STORE_VERSION = 2
+TRADES_STORE_MARKER = f"_STORE_VERSION_{TRADES_STORE_VERSION}"
+
+def get_derived_trade_columns() -> List[Expr]:
+    """
+    Per-trade columns derived when trades are loaded, also stored in the Parquet store:
+    duration_s (whole seconds the trade was open) and pnl (profit + swap + commission)
+    """
+    return [
+        (col("closed_at") - col("opened_at")).dt.total_seconds().cast(pl.Int32).alias("duration_s"),
+        # A missing profit/swap/commission counts as 0
+        pl.sum_horizontal("profit", "swap", "commission").alias("pnl")
+    ]
+
+def scan_trades_csv_file(trades_file: Path) -> LazyFrame:
+    """Scan a trades CSV file with TRADES_CSV_SCHEMA types and the derived trade columns"""
+    return pl.scan_csv(
+        trades_file,
+        schema_overrides=TRADES_CSV_SCHEMA,
+        infer_schema=False
+    ).with_columns(get_derived_trade_columns())
 
 class TradeServiceError(Exception):
     """Custom exception for trade service errors"""
     pass
 
+def build_trades_store(trades_file: Path, store_dir: Path) -> None:
+    """
+    Write a trades CSV file as a Parquet store partitioned by trading_account_login
+    (hive layout, one directory per login). The store is written to a staging
+    directory first and only swapped in once complete, so an interrupted build
+    never leaves a partial store in place. TRADES_STORE_MARKER is written last.
+
+    Args:
+        trades_file: Path to the trades CSV file
+        store_dir: Path to the Parquet store directory
+
+    Raises:
+        TradeServiceError: If the store can't be written
+    """
+    staging_store = store_dir.with_name(store_dir.name + ".tmp")
+    try:
+        shutil.rmtree(staging_store, ignore_errors=True)
+        scan_trades_csv_file(trades_file).sink_parquet(
+            pl.PartitionByKey(staging_store, by="trading_account_login"),
+            mkdir=True
+        )
+        (staging_store / TRADES_STORE_MARKER).touch()
+        # Swap in the new store only once it has been fully written
+        shutil.rmtree(store_dir, ignore_errors=True)
+        staging_store.rename(store_dir)
+    except (OSError, pl.exceptions.PolarsError) as e:
+        shutil.rmtree(staging_store, ignore_errors=True)
+        raise TradeServiceError(f"Failed to build Parquet trades store: {str(e)}") from e
+
 class TradeService:
     """Service for reading and querying trade data using Polars"""
     
+    # Columns the rolling window itself needs (filter, window index, equity curve)
+    _ROLLING_WINDOW_COLS = ["trading_account_login", "opened_at", "closed_at", "pnl"]
+    
     def __init__(self):
         """Initialize trade service with data validation"""
         self._data_path = self._validate_and_get_data_path()
         self._trades_file = self._validate_trades_file()
+        self._trades_store = self._data_path / "trades_parquet"
+        # Its modification time stands for the store's, missing on stores of an older version
+        self._trades_store_marker = self._trades_store / TRADES_STORE_MARKER
+        # (source mtimes, scan) of the last trades scan built by _scan_trades
+        self._trades_scan: Optional[Tuple[Tuple[Optional[int], Optional[int]], LazyFrame]] = None
     
     def _validate_and_get_data_path(self) -> Path:
         """
@@ -34,14 +114,9 @@ class TradeService:
         Raises:
             TradeServiceError: If DATA_DIR is not set or path doesn't exist
         """
-        # Load environment variables
-        # Try to find .env file in project root (assuming service is in app/services/)
-        current_dir = Path(__file__).parent
-        project_root = current_dir.parent.parent
-        env_file = project_root / ".env"
-        
-        if env_file.exists():
-            load_dotenv(env_file)
+        # Project root (assuming service is in app/services/), the .env file
+        # itself is loaded once at process start by app.main
+        project_root = Path(__file__).parent.parent.parent
         
         # Get DATA_DIR from environment
         data_dir = os.getenv("DATA_DIR")
@@ -111,6 +186,71 @@ class TradeService:
         """Get the path to the trades CSV file"""
         return self._trades_file
 
+    def _get_source_mtimes(self) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Get the (Parquet store, trades_db.csv) modification times in ns, None if missing
+        The store's is taken from its version marker, so stores of an older version count as missing
+        """
+        mtimes = []
+        for source in (self._trades_store_marker, self._trades_file):
+            try:
+                mtimes.append(source.stat().st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return mtimes[0], mtimes[1]
+
+    def is_trades_store_fresh(self) -> bool:
+        """
+        Check whether the Parquet trades store exists in the current version
+        and is not older than trades_db.csv
+        """
+        store_mtime, csv_mtime = self._get_source_mtimes()
+        return store_mtime is not None and csv_mtime is not None and store_mtime >= csv_mtime
+
+    def ensure_trades_store(self) -> Path:
+        """
+        Materialize trades_db.csv as a Parquet store partitioned by trading_account_login
+        (hive layout, one directory per login) so per-account scans read a single partition.
+        The store is only rebuilt when trades_db.csv is newer than it or it was
+        written by an older version.
+
+        Returns:
+            Path: Path to the Parquet store directory
+
+        Raises:
+            TradeServiceError: If the store can't be written
+        """
+        if not self.is_trades_store_fresh():
+            build_trades_store(self._trades_file, self._trades_store)
+        return self._trades_store
+
+    def _scan_trades_csv(self) -> LazyFrame:
+        """Scan trades_db.csv with parsed datetimes and the derived trade columns"""
+        return scan_trades_csv_file(self._trades_file)
+
+    def _scan_trades(self) -> LazyFrame:
+        """
+        Scan trades with parsed datetimes, from the Parquet store while it is up to date
+        The scan is built once per version of the source files and shared by every query
+        """
+        source_mtimes = self._get_source_mtimes()
+        cached = self._trades_scan
+        if cached is not None and cached[0] == source_mtimes:
+            return cached[1]
+
+        store_mtime, csv_mtime = source_mtimes
+        if store_mtime is not None and csv_mtime is not None and store_mtime >= csv_mtime:
+            # Evaluate the login/resume predicates first, then decode only matching rows
+            trades_scan = pl.scan_parquet(
+                self._trades_store, hive_partitioning=True, parallel="prefiltered"
+            )
+        else:
+            trades_scan = self._scan_trades_csv()
+
+        # Stored as one tuple so concurrent readers never see a mismatched pair
+        self._trades_scan = (source_mtimes, trades_scan)
+        return trades_scan
+
     def compute_max_relative_drawdown(
         self,
         lazy_frame: LazyFrame, 
@@ -126,19 +266,16 @@ class TradeService:
         base_equity = starting_equity if starting_equity is not None else initial_equity
         base_peak = starting_peak if starting_peak is not None else initial_equity
 
-        # Compute equity curve (incremental from base_equity)
+        # Compute equity curve (incremental from base_equity) over the per-trade net result
         lazy_frame = lazy_frame.with_columns([
-            (lit(base_equity) + col("profit").cum_sum() + col("swap").cum_sum() + col("commission").cum_sum()).alias("equity")
+            (lit(base_equity) + col("pnl").cum_sum()).alias("equity")
         ])
 
-        # Compute global peak equity (cumulative max)
+        # Compute global peak equity (cumulative max) and relative drawdown in one pass
+        global_peak = col("equity").cum_max().clip(lower_bound=base_peak)
         lazy_frame = lazy_frame.with_columns([
-            col("equity").cum_max().clip(lower_bound=base_peak).alias("global_peak")
-        ])
-
-        # Compute global relative drawdown
-        lazy_frame = lazy_frame.with_columns([
-            ((col("equity") - col('global_peak')) / col('global_peak')).alias("global_drawdown")
+            global_peak.alias("global_peak"),
+            ((col("equity") - global_peak) / global_peak).alias("global_drawdown")
         ])
 
         return lazy_frame
@@ -157,15 +294,9 @@ class TradeService:
             TradeServiceError: If there's an error reading or processing the trades data
         """
         try:
-            # Create lazy frame and filter by account login
-            lazy_frame = pl.scan_csv(self._trades_file)
-            
-            # Convert closed_at to datetime and filter by account
+            # Filter by account, closed_at is already a datetime
             result = (
-                lazy_frame
-                .with_columns([
-                    pl.col("closed_at").str.strptime(pl.Datetime, "%Y-%m-%d %H:%M:%S%.f")
-                ])
+                self._scan_trades()
                 .filter(pl.col("trading_account_login") == account_login)
                 .select(pl.col("closed_at").max().alias("latest_trade"))
                 .collect()
@@ -177,8 +308,43 @@ class TradeService:
                 
             return result["latest_trade"][0]
             
-        except Exception as e:
-            raise TradeServiceError(f"Error getting most recent trade timestamp for login {account_login}: {str(e)}")
+        except (OSError, pl.exceptions.PolarsError) as e:
+            raise TradeServiceError(f"Error getting most recent trade timestamp for login {account_login}: {str(e)}") from e
+
+    def get_trade_stats_by_account(
+        self, account_logins: List[int]
+    ) -> Dict[int, Tuple[Optional[datetime], int]]:
+        """
+        Get the most recent trade timestamp (closed_at) and trade count of many accounts
+        with a single scan of the trades data
+        
+        Args:
+            account_logins: The trading account login IDs to include
+            
+        Returns:
+            Dict mapping login to (latest closed_at, trade count), accounts without
+            trades are left out
+            
+        Raises:
+            TradeServiceError: If there's an error reading or processing the trades data
+        """
+        try:
+            result = (
+                self._scan_trades()
+                .filter(pl.col("trading_account_login").is_in(account_logins))
+                .group_by("trading_account_login")
+                .agg([
+                    pl.col("closed_at").max().alias("latest_trade"),
+                    pl.len().alias("trade_count")
+                ])
+                .collect()
+            )
+            return {
+                login: (latest_trade, trade_count)
+                for login, latest_trade, trade_count in result.iter_rows()
+            }
+        except (OSError, pl.exceptions.PolarsError) as e:
+            raise TradeServiceError(f"Error getting trade stats for {len(account_logins)} accounts: {str(e)}") from e
 
     def create_rolling_window_lazy_frame(
         self, 
@@ -188,7 +354,9 @@ class TradeService:
         equity: float = 100_000,
         resume_from_equity: Optional[float] = None,
         resume_from_peak: Optional[float] = None,
-        resume_from_datetime: Optional[datetime] = None
+        resume_from_datetime: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        row_columns: Optional[List[Expr]] = None
     ) -> Optional[LazyGroupBy]: 
         """
         Create a dynamic group-by lazy frame for trades using Polars
@@ -201,18 +369,24 @@ class TradeService:
             resume_from_equity: Last known equity value (for resuming)
             resume_from_peak: Last known peak equity value (for resuming)
             resume_from_datetime: Last computed window datetime (for filtering new trades)
+            columns: Trade columns the caller aggregates on, only these (plus the ones
+                needed here) are read from the trades file. All columns if None
+            row_columns: Per-trade columns to add before windowing, so aggregations
+                can reuse them instead of recomputing them in every window
 
         Returns:
             LazyGroupBy with dynamic group_by ready to be aggregated
         """
         try:
-            lazy_frame = pl.scan_csv(self._trades_file)
+            # Datetime columns are already parsed, the login filter below
+            # selects a single partition when reading from the Parquet store
+            lazy_frame = self._scan_trades()
 
-            #convert datetime columns to datetime
-            lazy_frame = lazy_frame.with_columns([
-                pl.col("opened_at").str.strptime(pl.Datetime, "%Y-%m-%d %H:%M:%S%.f"),
-                pl.col("closed_at").str.strptime(pl.Datetime, "%Y-%m-%d %H:%M:%S%.f")
-            ])
+            # Project early so the scan only reads the columns in use
+            if columns is not None:
+                lazy_frame = lazy_frame.select(
+                    list(dict.fromkeys(self._ROLLING_WINDOW_COLS + columns))
+                )
 
             #filter by account login
             lazy_frame = lazy_frame.filter(
@@ -237,6 +411,9 @@ class TradeService:
                 starting_peak=resume_from_peak
             )
 
+            if row_columns:
+                lazy_frame = lazy_frame.with_columns(row_columns)
+
             # Create a rolling window by using group_by_dynamic
             lazy_window = lazy_frame.group_by_dynamic(
                 index_column="closed_at",
@@ -248,7 +425,7 @@ class TradeService:
 
             return lazy_window
 
-        except Exception as e:
+        except (OSError, pl.exceptions.PolarsError) as e:
             print(f"Error creating rolling window lazy frame: {e}")
             return None
     
@@ -266,22 +443,42 @@ class TradeService:
             Number of matching records (int)
         """
         try:
-            lazy_frame = pl.scan_csv(self._trades_file)
-            lf = lazy_frame.filter(pl.col("trading_account_login") == account_login)
+            lf = self._scan_trades().filter(pl.col("trading_account_login") == account_login)
             if closed_at is not None:
-                # Parse closed_at column as datetime for comparison
-                lf = lf.with_columns([
-                    pl.col("closed_at").str.strptime(pl.Datetime, "%Y-%m-%d %H:%M:%S%.f").alias("closed_at_dt")
-                ])
-                lf = lf.filter(pl.col("closed_at_dt") > closed_at)
-            result = lf.select(pl.count()).collect()
-            return int(result[0, 0])
-        except Exception as e:
-            raise TradeServiceError(f"Failed to count trades for account {account_login}: {str(e)}")
+                lf = lf.filter(pl.col("closed_at") > closed_at)
+            # pl.len() counts rows without reading any column values
+            return lf.select(pl.len()).collect().item()
+        except (OSError, pl.exceptions.PolarsError) as e:
+            raise TradeServiceError(f"Failed to count trades for account {account_login}: {str(e)}") from e
+
+    def has_at_least_n_trades(self, account_login: int, n: int) -> bool:
+        """
+        Check whether an account has at least n trades, stops reading after the n-th match
+        instead of counting every trade of the account
+
+        Args:
+            account_login: The trading account login ID to filter by
+            n: Minimum number of trades
+
+        Returns:
+            True if the account has n or more trades
+        """
+        try:
+            matches = (
+                self._scan_trades()
+                .filter(pl.col("trading_account_login") == account_login)
+                .select("trading_account_login")
+                .head(n)
+                .collect()
+            )
+            return matches.height >= n
+        except (OSError, pl.exceptions.PolarsError) as e:
+            raise TradeServiceError(f"Failed to count trades for account {account_login}: {str(e)}") from e
 
+@cache
 def create_trade_service() -> TradeService:
     """
-    Create and return a TradeService instance
+    Create the TradeService instance on first call and return the same one afterwards
     
     Returns:
         TradeService: Configured trade service instance
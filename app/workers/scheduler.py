@@ -1,17 +1,22 @@
 """
 Scheduler configuration and management for background tasks
 """
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from app.workers.tasks.indicators_task import run_bulk_indicators_analysis
+from app.workers.tasks.indicators_task import run_bulk_indicators_analysis_async
 
-def create_scheduler() -> BackgroundScheduler:
-    """Create and configure the scheduler with all background jobs"""
-    scheduler = BackgroundScheduler()
+def create_scheduler() -> AsyncIOScheduler:
+    """
+    Create and configure the scheduler with all background jobs
+
+    The scheduler runs on the application event loop (it must be started from
+    inside it), blocking job bodies are handed off to worker threads
+    """
+    scheduler = AsyncIOScheduler()
     
-    # Add indicators analysis job - runs every 5 minutes
+    # Add indicators analysis job - checks for new trades every minute
     scheduler.add_job(
-        run_bulk_indicators_analysis,
+        run_bulk_indicators_analysis_async,
         'interval',
         minutes=1,
         id='bulk_indicators_analysis',
@@ -20,10 +25,10 @@ def create_scheduler() -> BackgroundScheduler:
     
     return scheduler
 
-def start_scheduler(scheduler: BackgroundScheduler) -> None:
+def start_scheduler(scheduler: AsyncIOScheduler) -> None:
     """Start the provided scheduler"""
     scheduler.start()
 
-def shutdown_scheduler(scheduler: BackgroundScheduler) -> None:
+def shutdown_scheduler(scheduler: AsyncIOScheduler) -> None:
     """Shutdown the provided scheduler gracefully"""
     scheduler.shutdown() 
\ No newline at end of file
@@ -1,17 +1,40 @@
 """
 Background task for indicators analysis
 """
+import asyncio
+from time import monotonic
+from typing import Optional, Tuple
+
 from app.services.indicators_service import create_indicators_service
 
+# A pass runs when trades_db.csv changed since the last clean pass, and at
+# least this often regardless, as a safety net
+FULL_PASS_INTERVAL_SECONDS = 15 * 60
+
+# (trades_db.csv mtime in ns, monotonic time) of the last pass without failures
+_last_clean_pass: Optional[Tuple[int, float]] = None
+
 def run_bulk_indicators_analysis() -> None:
     """
     Background task to run bulk indicators analysis for all accounts
-    This function will be executed every 5 minutes by the scheduler
+    This function is executed every minute by the scheduler, ticks where
+    trades_db.csv is unchanged since the last clean pass are skipped
     """
+    global _last_clean_pass
     try:
         # Create indicators service
         indicators_service = create_indicators_service()
         
+        # Nothing new to analyse if the trades file did not change
+        trades_mtime = indicators_service.trade_service.get_trades_file_path().stat().st_mtime_ns
+        now = monotonic()
+        if (
+            _last_clean_pass is not None
+            and _last_clean_pass[0] == trades_mtime
+            and now - _last_clean_pass[1] < FULL_PASS_INTERVAL_SECONDS
+        ):
+            return
+        
         # Execute bulk analysis for all accounts
         result = indicators_service.execute_bulk_analysis(
             account_logins=None,  # Process all accounts
@@ -19,6 +42,17 @@ def run_bulk_indicators_analysis() -> None:
             max_workers=4
         )
         
+        # Accounts that failed are retried on the next tick
+        if result["failed_accounts"] == 0:
+            _last_clean_pass = (trades_mtime, now)
+        
     except Exception as e:
         # Silently handle errors for now
-        pass 
\ No newline at end of file
+        pass
+
+async def run_bulk_indicators_analysis_async() -> None:
+    """
+    Scheduler entry point: runs run_bulk_indicators_analysis in a worker thread
+    so the Polars/SQLAlchemy work does not block the event loop
+    """
+    await asyncio.to_thread(run_bulk_indicators_analysis)
@@ -1,24 +1,25 @@
 """
 Data Preprocessing Script
-Joins and organizes trade CSV files using heapq.merge for memory efficiency
+Joins and organizes trade CSV files using a streaming Polars sorted merge
 """
 import os
 import sys
 import heapq
 import csv
+import shutil
 from pathlib import Path
-from typing import (
-    Iterator,
-    Tuple,
-    Dict,
-    Any,
-    List
-)
+from typing import List
 from tempfile import NamedTemporaryFile
 
 import polars as pl
 from dotenv import load_dotenv
 
+# Make the app package importable when run as `python scripts/preprocessing_data.py`
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.account_service import ACCOUNTS_CSV_SCHEMA
+from app.services.trade_service import TradeServiceError, build_trades_store
+
 def get_close_time_column(file_path: str) -> str:
     """Find the close time column in the CSV file"""
     close_time_columns = ['closed_at', 'close_time', 'closetime', 'close_datetime']
@@ -28,100 +29,90 @@ def get_close_time_column(file_path: str) -> str:
         reader = csv.reader(f)
         headers = next(reader)
     
+    # Candidates are tried in priority order against a set of the header names
+    header_set = set(headers)
     for col in close_time_columns:
-        if col in headers:
+        if col in header_set:
             return col
     
     raise ValueError(f"No close time column found in {file_path}. Available: {headers}")
 
-def csv_row_iterator(file_path: str, sort_column: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
-    """Iterator that yields (sort_key, row_dict) tuples for heapq.merge"""
-    from datetime import datetime
+def scan_trades_csv(file_path: str, headers: List[str]) -> pl.LazyFrame:
+    """
+    Lazily scan a trades CSV file with every field kept as a string, columns
+    in the order of headers (columns missing from the file are left empty)
+    """
+    lazy_frame = pl.scan_csv(file_path, infer_schema=False)
+    file_headers = lazy_frame.collect_schema().names()
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Convert datetime string to datetime object for proper comparison
-            date_str = row[sort_column]
-            try:
-                # Try to parse the datetime string - this ensures proper chronological sorting
-                datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S.%f")
-                # If parsing succeeds, use the original string (ISO format sorts correctly)
-                sort_key = date_str
-            except ValueError:
-                try:
-                    # Try alternative format without microseconds
-                    datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    sort_key = date_str
-                except ValueError:
-                    # If parsing fails, use string as-is (fallback)
-                    print(f"⚠️  Warning: Could not parse datetime '{date_str}', using string comparison")
-                    sort_key = date_str
-            
-            yield (sort_key, row)
+    unknown_columns = set(file_headers) - set(headers)
+    if unknown_columns:
+        raise ValueError(f"{file_path} has columns not in the output header: {sorted(unknown_columns)}")
+    
+    if file_headers == headers:
+        return lazy_frame
+    return lazy_frame.select([
+        pl.col(name) if name in file_headers else pl.lit(None, pl.String).alias(name)
+        for name in headers
+    ])
+
+def count_csv_records(file_path: str) -> int:
+    """Count the data rows of a CSV file"""
+    return pl.scan_csv(file_path, infer_schema=False).select(pl.len()).collect().item()
 
 def join_and_organize_trades(
-    trades_file1: str, 
-    trades_file2: str, 
+    trades_files: List[str], 
     output_file: str
 ) -> None:
     """
-    Join and organize trade CSV files using heapq.merge for memory efficiency
+    Join and organize trade CSV files with a streaming Polars sorted merge
     
     Args:
-        trades_file1: Path to first trades CSV file
-        trades_file2: Path to second trades CSV file  
+        trades_files: Paths to the trades CSV files, on duplicate identifiers
+            the earlier file wins when close times are equal
         output_file: Path to output combined CSV file
     """
-    print(f"📄 Processing trades CSV files with heapq.merge...")
+    print(f"📄 Processing trades CSV files with a streaming sorted merge...")
     
     try:
         # Find the close time column
         print("🔍 Detecting close time column...")
-        sort_column = get_close_time_column(trades_file1)
+        sort_column = get_close_time_column(trades_files[0])
         print(f"   ✅ Using sort column: {sort_column}")
-        print("   ✅ Assuming both files are already sorted by closed_at")
+        print("   ✅ Assuming all files are already sorted by closed_at")
         
         print("🔗 Merging pre-sorted files with deduplication...")
         
         # Get headers from first file
-        with open(trades_file1, 'r', encoding='utf-8') as f:
+        with open(trades_files[0], 'r', encoding='utf-8') as f:
             reader = csv.reader(f)
             headers = next(reader)
         
         # Check if identifier column exists
         has_identifier = 'identifier' in headers
-        seen_identifiers = set() if has_identifier else None
-        
-        # Create iterators for already-sorted files
-        iter1 = csv_row_iterator(trades_file1, sort_column)
-        iter2 = csv_row_iterator(trades_file2, sort_column)
         
-        # Use heapq.merge to combine sorted iterators
-        merged_iterator = heapq.merge(iter1, iter2, key=lambda x: x[0])
+        # Fields stay strings, ISO timestamps sort chronologically as text
+        # and values are written back exactly as read. The merges are chained
+        # left to right, so on equal keys rows keep the order of trades_files
+        merged = scan_trades_csv(trades_files[0], headers)
+        for trades_file in trades_files[1:]:
+            merged = merged.merge_sorted(scan_trades_csv(trades_file, headers), key=sort_column)
         
-        # Write merged and deduplicated results
-        total_records = 0
-        duplicates_removed = 0
+        # Record counts come from one pass over the merged inputs, deduplication
+        # keeps one row per identifier so the output is never read back
+        counts = merged.select(
+            total=pl.len(),
+            final=pl.col("identifier").n_unique() if has_identifier else pl.len()
+        ).collect(engine="streaming")
+        total_records = counts["total"][0]
+        final_count = counts["final"][0]
+        duplicates_removed = total_records - final_count
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            
-            for sort_key, row in merged_iterator:
-                total_records += 1
-                
-                # Handle deduplication if identifier column exists
-                if has_identifier:
-                    identifier = row['identifier']
-                    if identifier in seen_identifiers:
-                        duplicates_removed += 1
-                        continue
-                    seen_identifiers.add(identifier)
-                
-                writer.writerow(row)
+        # Keep the first occurrence of each identifier in merged order
+        if has_identifier:
+            merged = merged.unique(subset="identifier", keep="first", maintain_order=True)
         
-        final_count = total_records - duplicates_removed
+        merged.sink_csv(output_file, engine="streaming")
         
         print(f"   📊 Total records processed: {total_records}")
         if has_identifier and duplicates_removed > 0:
@@ -150,16 +141,18 @@ def copy_accounts_file(source_file: str, target_file: str) -> None:
     try:
         print(f"   - Reading {source_file}")
         
-        # Simple file copy operation using Polars for consistency
-        df = pl.read_csv(source_file)
-        print(f"     Found {len(df)} account records")
-        print(f"📊 Columns: {df.columns}")
+        # Only the header is parsed, the rows are counted natively
+        with open(source_file, 'r', encoding='utf-8') as f:
+            headers = next(csv.reader(f))
+        record_count = count_csv_records(source_file)
+        print(f"     Found {record_count} account records")
+        print(f"📊 Columns: {headers}")
         
-        # Save as CSV with new name
+        # The file is copied unchanged, no need to parse and re-serialise it
         print(f"💾 Saving accounts data to {target_file}")
-        df.write_csv(target_file)
+        shutil.copyfile(source_file, target_file)
         
-        print(f"✅ Successfully created {target_file} with {len(df)} records")
+        print(f"✅ Successfully created {target_file} with {record_count} records")
         
     except FileNotFoundError as e:
         print(f"❌ Error: File not found - {e}")
@@ -168,6 +161,49 @@ def copy_accounts_file(source_file: str, target_file: str) -> None:
         print(f"❌ Error processing accounts file: {e}")
         sys.exit(1)
 
+def convert_accounts_to_parquet(source_file: str, target_file: str) -> None:
+    """
+    Write accounts CSV file as accounts_db.parquet with column statistics
+    
+    Args:
+        source_file: Path to source accounts CSV file
+        target_file: Path to target accounts_db.parquet file
+    """
+    print(f"📄 Converting accounts file to Parquet...")
+    
+    try:
+        # Same column types the app enforces when reading accounts_db.csv
+        pl.scan_csv(
+            source_file, schema_overrides=ACCOUNTS_CSV_SCHEMA, infer_schema=False
+        ).sink_parquet(target_file, statistics=True)
+        print(f"✅ Successfully created {target_file}")
+        
+    except FileNotFoundError as e:
+        print(f"❌ Error: File not found - {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error converting accounts file: {e}")
+        sys.exit(1)
+
+def convert_trades_to_parquet_store(source_file: str, target_dir: str) -> None:
+    """
+    Write trades CSV file as a Parquet store partitioned by trading_account_login,
+    built the same way the app builds it (see build_trades_store)
+    
+    Args:
+        source_file: Path to source trades_db.csv file
+        target_dir: Path to target trades_parquet directory
+    """
+    print(f"📄 Converting trades file to partitioned Parquet store...")
+    
+    try:
+        build_trades_store(Path(source_file), Path(target_dir))
+        print(f"✅ Successfully created {target_dir}")
+        
+    except TradeServiceError as e:
+        print(f"❌ Error converting trades file: {e}")
+        sys.exit(1)
+
 # --- External Sorting Utilities ---
 def sort_and_save_chunk(rows: List[List[str]], sort_key: int, chunk_id: int) -> str:
     """
@@ -244,6 +280,47 @@ def external_sort_csv(input_path: str, output_path: str, sort_column: str, chunk
         os.remove(fp)
     print(f"✅ Sorted file saved to {output_path}")
 
+def resolve_env_path(var_name: str, project_root: Path, example_dir: str) -> Path:
+    """
+    Read a directory path from an environment variable and resolve it to an
+    absolute path, relative values are taken from the project root
+    
+    Args:
+        var_name: Environment variable holding the path
+        project_root: Base directory for relative paths
+        example_dir: Directory name shown in the help message when the variable is unset
+        
+    Returns:
+        Path: Absolute resolved path (not checked for existence)
+    """
+    env_value = os.getenv(var_name)
+    if not env_value:
+        print(f"❌ Error: {var_name} environment variable is not set!")
+        print(f"Please add {var_name} to your .env file, example:")
+        print(f"{var_name}=./{example_dir}")
+        print(f"{var_name}=/absolute/path/to/{example_dir}")
+        sys.exit(1)
+    
+    print(f"🔍 Resolving {var_name}: {env_value}")
+    
+    if env_value.startswith('./') or not os.path.isabs(env_value):
+        # Relative path - resolve relative to project root
+        if env_value.startswith('./'):
+            # Remove ./ prefix
+            relative_path = env_value[2:]
+        else:
+            relative_path = env_value
+        
+        resolved_path = project_root / relative_path
+        print(f"   📁 Resolved relative path: {env_value} -> {resolved_path}")
+    else:
+        # Absolute path
+        resolved_path = Path(env_value)
+        print(f"   📁 Using absolute path: {resolved_path}")
+    
+    # Convert to absolute path for consistency
+    return resolved_path.resolve()
+
 def main():
     """Main preprocessing function"""
     print("🚀 Starting data preprocessing...")
@@ -260,74 +337,18 @@ def main():
     else:
         print(f"   ⚠️  No .env file found at {env_file}")
     
-    # Validate RAW_DATA_DIR environment variable (for input files)
-    raw_data_dir = os.getenv("RAW_DATA_DIR")
-    if not raw_data_dir:
-        print("❌ Error: RAW_DATA_DIR environment variable is not set!")
-        print("Please add RAW_DATA_DIR to your .env file, example:")
-        print("RAW_DATA_DIR=./raw_data")
-        print("RAW_DATA_DIR=/absolute/path/to/raw_data")
-        sys.exit(1)
-    
-    # Validate DATA_DIR environment variable (for output files)
-    output_data_dir = os.getenv("DATA_DIR")
-    if not output_data_dir:
-        print("❌ Error: DATA_DIR environment variable is not set!")
-        print("Please add DATA_DIR to your .env file, example:")
-        print("DATA_DIR=./data")
-        print("DATA_DIR=/absolute/path/to/data")
-        sys.exit(1)
-    
-    # Resolve RAW_DATA_DIR path relative to project root
-    print(f"🔍 Resolving RAW_DATA_DIR: {raw_data_dir}")
-    
-    if raw_data_dir.startswith('./') or not os.path.isabs(raw_data_dir):
-        # Relative path - resolve relative to project root
-        if raw_data_dir.startswith('./'):
-            # Remove ./ prefix
-            relative_path = raw_data_dir[2:]
-        else:
-            relative_path = raw_data_dir
-        
-        raw_data_path = project_root / relative_path
-        print(f"   📁 Resolved relative path: {raw_data_dir} -> {raw_data_path}")
-    else:
-        # Absolute path
-        raw_data_path = Path(raw_data_dir)
-        print(f"   📁 Using absolute path: {raw_data_path}")
-    
-    # Convert to absolute path for consistency
-    raw_data_path = raw_data_path.resolve()
+    # Input files are read from RAW_DATA_DIR, output files written to DATA_DIR
+    raw_data_path = resolve_env_path("RAW_DATA_DIR", project_root, "raw_data")
+    output_data_path = resolve_env_path("DATA_DIR", project_root, "data")
     
-    if not raw_data_path.exists():
+    if not raw_data_path.is_dir():
         print(f"❌ Error: RAW_DATA_DIR path does not exist: {raw_data_path}")
-        print(f"   Original value: {raw_data_dir}")
+        print(f"   Original value: {os.getenv('RAW_DATA_DIR')}")
         print(f"   Resolved to: {raw_data_path}")
         sys.exit(1)
     
     print(f"✅ Using RAW_DATA_DIR: {raw_data_path}")
     
-    # Resolve DATA_DIR path relative to project root
-    print(f"🔍 Resolving DATA_DIR: {output_data_dir}")
-    
-    if output_data_dir.startswith('./') or not os.path.isabs(output_data_dir):
-        # Relative path - resolve relative to project root
-        if output_data_dir.startswith('./'):
-            # Remove ./ prefix
-            relative_path = output_data_dir[2:]
-        else:
-            relative_path = output_data_dir
-        
-        output_data_path = project_root / relative_path
-        print(f"   📁 Resolved relative path: {output_data_dir} -> {output_data_path}")
-    else:
-        # Absolute path
-        output_data_path = Path(output_data_dir)
-        print(f"   📁 Using absolute path: {output_data_path}")
-    
-    # Convert to absolute path for consistency
-    output_data_path = output_data_path.resolve()
-    
     # Create output directory if it doesn't exist
     if not output_data_path.exists():
         print(f"📁 Creating DATA_DIR: {output_data_path}")
@@ -342,18 +363,19 @@ def main():
     
     # Output files (using DATA_DIR path) - CSV format
     trades_output = output_data_path / "trades_db.csv"
+    trades_parquet_output = output_data_path / "trades_parquet"
     accounts_output = output_data_path / "accounts_db.csv"
+    accounts_parquet_output = output_data_path / "accounts_db.parquet"
     
     # Check if input files exist
     print("🔍 Checking input files...")
-    missing_files = []
-    
-    if not trades_file1.exists():
-        missing_files.append(str(trades_file1))
-    if not trades_file2.exists():
-        missing_files.append(str(trades_file2))
-    if not accounts_file.exists():
-        missing_files.append(str(accounts_file))
+    # One directory listing instead of a stat per input file
+    present_files = set(os.listdir(raw_data_path))
+    missing_files = [
+        str(input_file)
+        for input_file in (trades_file1, trades_file2, accounts_file)
+        if input_file.name not in present_files
+    ]
     
     if missing_files:
         print("❌ Missing input files:")
@@ -372,10 +394,13 @@ def main():
     print("PROCESSING TRADES DATA")
     print("="*50)
     join_and_organize_trades(
-        str(trades_file1),
-        str(trades_file2), 
+        [str(trades_file1), str(trades_file2)],
         str(trades_output)
     )
+    convert_trades_to_parquet_store(
+        str(trades_output),
+        str(trades_parquet_output)
+    )
     
     # Process accounts file
     print("\n" + "="*50)
@@ -385,13 +410,19 @@ def main():
         str(accounts_file),
         str(accounts_output)
     )
+    convert_accounts_to_parquet(
+        str(accounts_output),
+        str(accounts_parquet_output)
+    )
     
     print("\n" + "="*50)
     print("PREPROCESSING COMPLETE")
     print("="*50)
     print(f"📁 Output files created:")
     print(f"   - {trades_output}")
+    print(f"   - {trades_parquet_output}")
     print(f"   - {accounts_output}")
+    print(f"   - {accounts_parquet_output}")
     print("\n🎉 Data preprocessing completed successfully!")
 
 if __name__ == "__main__":
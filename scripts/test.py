@@ -1,6 +1,11 @@
 from sys import path
 path.append(".")
 
+from dotenv import load_dotenv
+
+# Services read DATA_DIR from the environment, app.main loads .env for the app
+load_dotenv(".env")
+
 from app.services.indicators_service import create_indicators_service, get_all_trading_indicators, get_max_relative_drawdown_filter
 from app.services.trade_service import create_trade_service
 